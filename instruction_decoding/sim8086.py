@@ -5,290 +5,350 @@
 # - jmps
 
 import argparse
+from functools import lru_cache
+from itertools import islice
 
-MOV_IMMEDIATE_BIN = "1011"
-ARITHMETIC_IMM_BIN = "100000"
-ADD_OCT_BIN = "000"
-SUB_OCT_BIN = "101"
-CMP_OCT_BIN = "111"
-ARITH_IMM_ACC_BINS = {f"00{op}" for op in (ADD_OCT_BIN, SUB_OCT_BIN, CMP_OCT_BIN)}
-MOD_R = "11"
+MOV_IMMEDIATE = 0b1011
+ARITHMETIC_IMM = 0b100000
+ADD_OCT = 0b000
+SUB_OCT = 0b101
+CMP_OCT = 0b111
+ARITH_IMM_ACC = {ADD_OCT, SUB_OCT, CMP_OCT}
+MOD_R = 0b11
 
 opcode_to_name = {
-    "100010": "mov",
-    "000000": "add",
-    "001010": "sub",
-    "001110": "cmp",
+    0b100010: "mov",
+    0b000000: "add",
+    0b001010: "sub",
+    0b001110: "cmp",
 }
 
 immediate_to_reg_name_map = {
-    "000": "add",
-    "101": "sub",
-    "111": "cmp",
+    ADD_OCT: "add",
+    SUB_OCT: "sub",
+    CMP_OCT: "cmp",
 }
 
-mod_bytes_to_fetch = {
-    "00": 0,
-    "01": 1,
-    "10": 2,
-    "11": 0,
-}
+# Displacement bytes to fetch, indexed by mod
+MOD_DISP = (0, 1, 2, 0)
+
+# Indexed by (w << 3) | reg
+REG = (
+    "al", "cl", "dl", "bl", "ah", "ch", "dh", "bh",
+    "ax", "cx", "dx", "bx", "sp", "bp", "si", "di",
+)
+
+# Indexed by r/m
+EA = (
+    "bx + si",
+    "bx + di",
+    "bp + si",
+    "bp + di",
+    "si",
+    "di",
+    "bp",
+    "bx",
+)
 
-reg_and_rm_field_encoding = {
-    "000": {"0": "AL", "1": "AX"},
-    "001": {"0": "CL", "1": "CX"},
-    "010": {"0": "DL", "1": "DX"},
-    "011": {"0": "BL", "1": "BX"},
-    "100": {"0": "AH", "1": "SP"},
-    "101": {"0": "CH", "1": "BP"},
-    "110": {"0": "DH", "1": "SI"},
-    "111": {"0": "BH", "1": "DI"},
+JUMP_OPCODES = {
+    0x70: "jo",   0x71: "jno",
+    0x72: "jb",   0x73: "jnb",
+    0x74: "je",   0x75: "jnz",
+    0x76: "jbe",  0x77: "ja",
+    0x78: "js",   0x79: "jns",
+    0x7A: "jp",   0x7B: "jnp",
+    0x7C: "jl",   0x7D: "jnl",
+    0x7E: "jle",  0x7F: "jg",
+    0xE0: "loopnz", 0xE1: "loopz",
+    0xE2: "loop",   0xE3: "jcxz",
 }
 
-effective_address_map = {
-    "000": "BX + SI",
-    "001": "BX + DI",
-    "010": "BP + SI",
-    "011": "BP + DI",
-    "100": "SI",
-    "101": "DI",
-    "110": "BP",
-    "111": "BX",
-}
+# Jump mnemonic indexed by first byte, None for non-jump opcodes
+JUMP_TBL = tuple(JUMP_OPCODES.get(b0) for b0 in range(256))
 
-JUMP_OPCODES = {
-    "01110000": "jo",   "01110001": "jno",
-    "01110010": "jb",   "01110011": "jnb",
-    "01110100": "je",   "01110101": "jnz",
-    "01110110": "jbe",  "01110111": "ja",
-    "01111000": "js",   "01111001": "jns",
-    "01111010": "jp",   "01111011": "jnp",
-    "01111100": "jl",   "01111101": "jnl",
-    "01111110": "jle",  "01111111": "jg",
-    "11100000": "loopnz", "11100001": "loopz",
-    "11100010": "loop",   "11100011": "jcxz",
-}
+def disp_length(b1: int) -> int:
+    """
+    Displacement bytes following a mod reg r/m byte.
+    - mod=00, r/m=110 is a 16-bit direct address instead of [bp].
+    """
+    if b1 & 0b11000111 == 0b00000110:
+        return 2
+    return MOD_DISP[b1 >> 6]
 
-def decode_with_mem(opc_name: str, asm_bytes: bytes) -> str:
+def build_two_byte_table() -> list:
+    """
+    Precompute the text of every reg/memory instruction, indexed by (b0 << 8) | b1.
+    - Register and no-displacement forms are complete instructions.
+    - Displacement forms keep a %d placeholder for the displacement.
+    Entries whose first byte is not a reg/memory opcode are left as None.
+    """
+    table = [None] * 65536
+    for b0 in range(256):
+        opc_name = opcode_to_name.get(b0 >> 2)
+        if opc_name is None:
+            continue
+
+        direction = (b0 >> 1) & 1
+        word = b0 & 1
+        for b1 in range(256):
+            mod = b1 >> 6
+            reg_code = REG[(word << 3) | ((b1 >> 3) & 7)]
+            rm = b1 & 7
+            if mod == MOD_R:
+                rm_code = REG[(word << 3) | rm]
+            elif mod == 0b00:
+                rm_code = "[%d]" if rm == 0b110 else f"[{EA[rm]}]"
+            else:
+                rm_code = f"[{EA[rm]} + %d]"
+
+            if direction:
+                table[(b0 << 8) | b1] = f"{opc_name} {reg_code}, {rm_code}"
+            else:
+                table[(b0 << 8) | b1] = f"{opc_name} {rm_code}, {reg_code}"
+    return table
+
+TWO_BYTE = build_two_byte_table()
+
+def decode_with_mem(asm_bytes: bytes, i: int) -> str:
     """
     Spec: 100010 d w | mod reg r/m | DISP-LO | DISP-HI
     - Always pull first and second byte.
     - Third and fourth bytes are only pulled depending on MOD type.
     """
-    first_byte = bin(asm_bytes[0])[2:].zfill(8)
-    direction = first_byte[-2]
-    word = first_byte[-1]
-
-    second_byte = bin(asm_bytes[1])[2:].zfill(8)
-
-    # Find REG 
-    reg = second_byte[2:5]
-    reg_2_w_map = reg_and_rm_field_encoding.get(reg)
-    reg_code = reg_2_w_map.get(word) 
-
-    # Find R/M
-    mod = second_byte[:2]
-    rm = second_byte[-3:]
-    if mod == MOD_R:
-        rm_2_w_map = reg_and_rm_field_encoding.get(rm)
-        rm_code = rm_2_w_map.get(word)
-    elif mod == "00":
-        rm_code = effective_address_map.get(rm)
-        rm_code = f"[{rm_code}]"
-    elif mod == "01":
-        rm_code = effective_address_map.get(rm)
-        low_byte = asm_bytes[2]
-        rm_code = f"[{rm_code} + {low_byte}]" if low_byte != 0 else f"[{rm_code}]"
-    elif mod == "10":
-        rm_code = effective_address_map.get(rm)
-        low_byte = asm_bytes[2]
-        high_byte = asm_bytes[3]
-        rm_code = f"[{rm_code} + {low_byte + (high_byte << 8)}]"
-
-    if direction == "1":
-        return f"{opc_name} {reg_code.lower()}, {rm_code.lower()}"
+    b1 = asm_bytes[i+1]
+    mod = b1 >> 6
+    template = TWO_BYTE[(asm_bytes[i] << 8) | b1]
+
+    if mod == 0b01:
+        low_byte = asm_bytes[i+2]
+        return template % low_byte if low_byte != 0 else template.replace(" + %d", "")
+    elif disp_length(b1) == 2:
+        return template % (asm_bytes[i+2] + (asm_bytes[i+3] << 8))
     else:
-        return f"{opc_name} {rm_code.lower()}, {reg_code.lower()}"
+        return template
+
+# (register name, w) for MOV immediate, indexed by the low "w reg" nibble of the first byte
+MOV_IMM_TBL = tuple((REG[code], code >> 3) for code in range(16))
 
-def decode_mov_immediate(asm_bytes: bytes) -> str:
+def decode_mov_immediate(asm_bytes: bytes, i: int) -> str:
     """
     Spec: 1011 w reg
     - Pull one data byte if w = 0
     - Pull two data bytes if w = 1
     """
-    first_byte = bin(asm_bytes[0])[2:].zfill(8)
-    word = first_byte[4]
+    reg_code, word = MOV_IMM_TBL[asm_bytes[i] & 0b1111]
 
-    reg = first_byte[5:]
-    reg_2_w_map = reg_and_rm_field_encoding.get(reg)
-    reg_code = reg_2_w_map.get(word) 
+    if word:
+        value = ((asm_bytes[i+1] | (asm_bytes[i+2] << 8)) ^ 0x8000) - 0x8000
+    else:
+        value = (asm_bytes[i+1] ^ 0x80) - 0x80
+
+    return f"mov {reg_code}, {value}"
 
-    if word == "1":
-        value = asm_bytes[1] + (asm_bytes[2] << 8)
-        if value & 0x8000:
-            value -= 65536
+@lru_cache(maxsize=None)
+def arithmetic_immediate_template(word: int, b1: int, has_disp: bool) -> str:
+    """
+    Text of an immediate to reg/memory instruction for one (w, mod reg r/m) shape.
+    - Displacement forms keep a %d placeholder for the displacement.
+    - The immediate is always the last %d placeholder.
+    """
+    mod = b1 >> 6
+    rm = b1 & 7
+
+    # Resolve destination (r/m field)
+    if mod == MOD_R:
+        rm_code = REG[(word << 3) | rm]
+    elif mod == 0b00 and rm == 0b110:  # direct address: mod=00, r/m=110 is special-cased
+        rm_code = "[%d]"
+    elif has_disp:
+        rm_code = f"[{EA[rm]} + %d]"
     else:
-        value = asm_bytes[1]
-        if value & 0x80:
-            value -= 256
+        rm_code = f"[{EA[rm]}]"
 
-    return f"mov {reg_code.lower()}, {value}"
+    # Size prefix only needed for memory destinations (register implies its own size)
+    size_prefix = ("word " if word else "byte ") if mod != MOD_R else ""
+
+    opc_name = immediate_to_reg_name_map[(b1 >> 3) & 7]
+    return f"{opc_name} {size_prefix}{rm_code}, %d"
 
-def decode_arithmetic_immediate(asm_bytes: bytes) -> str:
+def decode_arithmetic_immediate(asm_bytes: bytes, i: int) -> str:
     """
     Spec: 100000 s w | mod reg r/m | DISP-LO | DISP-HI | data | data if s:w=01
     - Always pull first and second byte.
     - Third and fourth bytes are only pulled depending on MOD type.
     - One data byte if s=1 (sign-extend) or w=0; two data bytes if s=0 and w=1.
     """
-    first_byte = bin(asm_bytes[0])[2:].zfill(8)
-    second_byte = bin(asm_bytes[1])[2:].zfill(8)
-
-    word = first_byte[-1]
-    mod = second_byte[:2]
-    rm = second_byte[-3:]
-
-    # Resolve destination (r/m field)
-    disp_bytes = mod_bytes_to_fetch[mod]
-    if mod == MOD_R:
-        rm_code = reg_and_rm_field_encoding[rm][word]
-    elif mod == "00":
-        if rm == "110":  # direct address: mod=00, r/m=110 is special-cased
-            addr = asm_bytes[2] + (asm_bytes[3] << 8)
-            rm_code = f"[{addr}]"
-            disp_bytes = 2
-        else:
-            rm_code = f"[{effective_address_map[rm]}]"
-    elif mod == "01":
-        low_byte = asm_bytes[2]
-        ea = effective_address_map[rm]
-        rm_code = f"[{ea} + {low_byte}]" if low_byte != 0 else f"[{ea}]"
-    elif mod == "10":
-        low_byte = asm_bytes[2]
-        high_byte = asm_bytes[3]
-        ea = effective_address_map[rm]
-        rm_code = f"[{ea} + {low_byte + (high_byte << 8)}]"
+    b0 = asm_bytes[i]
+    b1 = asm_bytes[i+1]
+    word = b0 & 1
+
+    disp_bytes = disp_length(b1)
+    if disp_bytes == 2:
+        disp = asm_bytes[i+2] + (asm_bytes[i+3] << 8)
+    elif disp_bytes == 1:
+        disp = asm_bytes[i+2]
+    else:
+        disp = 0
+    # An 8-bit displacement of zero is written without the displacement
+    has_disp = disp_bytes == 2 or disp != 0
 
     # Immediate data starts after the 2 fixed bytes + any displacement bytes
     data_offset = 2 + disp_bytes
-    # Size prefix only needed for memory destinations (register implies its own size)
-    size_prefix = ("word " if word == "1" else "byte ") if mod != MOD_R else ""
 
-    s = first_byte[-2]
-    reg = second_byte[2:5]
-    opc_name = immediate_to_reg_name_map[reg]
+    s = (b0 >> 1) & 1
     # Two data bytes only when s=0 and w=1; s=1 means sign-extend one byte
-    if s == "0" and word == "1":
-        imm = asm_bytes[data_offset] + (asm_bytes[data_offset + 1] << 8)
-        if imm & 0x8000:
-            imm -= 65536
+    if not s and word:
+        imm = ((asm_bytes[i+data_offset] | (asm_bytes[i+data_offset+1] << 8)) ^ 0x8000) - 0x8000
     else:
-        imm = asm_bytes[data_offset]
-        if imm & 0x80:
-            imm -= 256
-    return f"{opc_name} {size_prefix}{rm_code.lower()}, {imm}"
+        imm = (asm_bytes[i+data_offset] ^ 0x80) - 0x80
+
+    template = arithmetic_immediate_template(word, b1, has_disp)
+    return template % (disp, imm) if has_disp else template % imm
 
-def decode_arith_accumulator(asm_bytes: bytes) -> str:
+def decode_arith_accumulator(asm_bytes: bytes, i: int) -> str:
     """
     Spec: 00 opc 10 w | data-lo | data-hi (if w=1)
     - Always pull first and second byte.
     - Third byte is only pulled if w=1.
     - Destination is always the accumulator: AL if w=0, AX if w=1.
     """
-    first_byte = bin(asm_bytes[0])[2:].zfill(8)
-    word = first_byte[-1]
+    b0 = asm_bytes[i]
+    word = b0 & 1
 
-    opc_name = immediate_to_reg_name_map[first_byte[2:5]]
-    dest = "ax" if word == "1" else "al"
+    opc_name = immediate_to_reg_name_map[(b0 >> 3) & 7]
+    dest = REG[word << 3]
 
-    if word == "1":
-        imm = asm_bytes[1] + (asm_bytes[2] << 8)
-        if imm & 0x8000:
-            imm -= 65536
+    if word:
+        imm = ((asm_bytes[i+1] | (asm_bytes[i+2] << 8)) ^ 0x8000) - 0x8000
     else:
-        imm = asm_bytes[1]
-        if imm & 0x80:
-            imm -= 256
+        imm = (asm_bytes[i+1] ^ 0x80) - 0x80
 
     return f"{opc_name} {dest}, {imm}"
 
-def decode_jump(asm_bytes: bytes) -> str:
+def decode_jump(asm_bytes: bytes, i: int) -> str:
     """
     Spec: 8-bit opcode | IP-INC8
     - Always pull two bytes: the opcode and a signed 8-bit offset.
     - Offset is relative to the next instruction (i.e. current instruction size + offset).
     """
-    first_byte = bin(asm_bytes[0])[2:].zfill(8)
-    opc_name = JUMP_OPCODES[first_byte]
-    offset = asm_bytes[1]
-    if offset & 0x80:
-        offset -= 256
+    opc_name = JUMP_TBL[asm_bytes[i]]
+    offset = (asm_bytes[i+1] ^ 0x80) - 0x80
     return f"{opc_name} ${2 + offset:+d}" 
 
-def decode_to_asm(asm_bytes: bytes) -> list[str]:
+def mem_length(b0: int, b1: int) -> int:
     """
-    Identify opcode and pull # of bytes needed to decode entire instruction
+    Length of a mod reg r/m instruction: 2 fixed bytes + displacement bytes
     """
-    i = 0
-    instructions = []
-    while i < len(asm_bytes):
-        instruction = bin(asm_bytes[i])[2:].zfill(8)
+    return 2 + disp_length(b1)
+
+def arithmetic_immediate_length(b0: int, b1: int) -> int:
+    """
+    Length of an immediate to reg/memory instruction: 2 fixed bytes + displacement bytes + data bytes
+    """
+    data_bytes = 2 if b0 & 0b11 == 0b01 else 1
+    return 2 + disp_length(b1) + data_bytes
 
+def build_dispatch_table() -> list:
+    """
+    Map every possible first byte to (decoder, length), where length is either the
+    instruction size or a function of the first two bytes that computes it.
+    Unsupported opcodes are left as None.
+    """
+    table = [None] * 256
+    for b0 in range(256):
         # MOV/ADD/SUB/CMP from reg/memory to register
-        if opc_name := opcode_to_name.get(instruction[:6], None):
-            second_byte = bin(asm_bytes[i+1])[2:].zfill(8)
-            mod = second_byte[:2]
-            bytes_to_fetch = 2 + mod_bytes_to_fetch.get(mod)
-            instructions.append(decode_with_mem(opc_name, asm_bytes[i:i+bytes_to_fetch]))
-
-        # MOV immediate to register
-        elif instruction[:4] == MOV_IMMEDIATE_BIN:
-            # Pull w to see if one or two bytes of data are needed
-            w = instruction[4]
-            bytes_to_fetch = 2 + int(w)
-            instructions.append(decode_mov_immediate(asm_bytes[i:i+bytes_to_fetch]))
+        if b0 >> 2 in opcode_to_name:
+            table[b0] = (decode_with_mem, mem_length)
+
+        # MOV immediate to register: one or two data bytes depending on w
+        elif b0 >> 4 == MOV_IMMEDIATE:
+            table[b0] = (decode_mov_immediate, 2 + ((b0 >> 3) & 1))
 
         # ADD/SUB/CMP immediate to register/memory
-        elif instruction[:6] == ARITHMETIC_IMM_BIN:
-            second_byte = bin(asm_bytes[i+1])[2:].zfill(8)
-            mod = second_byte[:2]
-            rm = second_byte[-3:]
-            w = instruction[-1]
-            s = instruction[-2]
-            data_bytes = 2 if (s == "0" and w == "1") else 1
-            disp_bytes = 2 if (mod == "00" and rm == "110") else mod_bytes_to_fetch[mod]
-            bytes_to_fetch = 2 + disp_bytes + data_bytes
-            instructions.append(decode_arithmetic_immediate(asm_bytes[i:i+bytes_to_fetch]))
+        elif b0 >> 2 == ARITHMETIC_IMM:
+            table[b0] = (decode_arithmetic_immediate, arithmetic_immediate_length)
 
         # ADD/SUB/CMP immediate to accumulator
-        elif instruction[:5] in ARITH_IMM_ACC_BINS:
-            # Pull w to see if one or two bytes of data are needed
-            w = instruction[-1]
-            bytes_to_fetch = 2 + int(w)
-            instructions.append(decode_arith_accumulator(asm_bytes[i:i+bytes_to_fetch]))
+        elif b0 >> 6 == 0b00 and b0 & 0b110 == 0b100 and (b0 >> 3) & 7 in ARITH_IMM_ACC:
+            table[b0] = (decode_arith_accumulator, 2 + (b0 & 1))
 
         # Jumps
-        elif instruction in JUMP_OPCODES: 
-            bytes_to_fetch = 2
-            instructions.append(decode_jump(asm_bytes[i:i+bytes_to_fetch]))
+        elif JUMP_TBL[b0] is not None:
+            table[b0] = (decode_jump, 2)
+
+    return table
+
+DISPATCH = build_dispatch_table()
+
+def build_length_table() -> bytes:
+    """
+    Precompute the instruction length for every (b0, b1) pair, indexed by (b0 << 8) | b1.
+    Unsupported opcodes have length 0.
+    """
+    table = bytearray(65536)
+    for b0, entry in enumerate(DISPATCH):
+        if entry is None:
+            continue
+
+        length = entry[1]
+        for b1 in range(256):
+            table[(b0 << 8) | b1] = length if isinstance(length, int) else length(b0, b1)
+    return bytes(table)
+
+LENGTHS = build_length_table()
+
+# Decoder for every possible first byte, so formatting is a single index + call
+DECODERS = tuple(entry and entry[0] for entry in DISPATCH)
 
-        else:
-            raise ValueError(f"Instruction decoding is not supported for {instruction} at index {i}")
+def instruction_offsets(asm_bytes: bytes) -> list[int]:
+    """
+    Integer-only pass: walk the buffer using the precomputed length table and record
+    where each instruction starts, followed by the offset just past the last one.
+    """
+    i = 0
+    offsets = [0]
+    append = offsets.append
+    lengths = LENGTHS
+    last = len(asm_bytes) - 1
+    # Every supported instruction is at least two bytes long
+    while i < last:
+        bytes_to_fetch = lengths[(asm_bytes[i] << 8) | asm_bytes[i+1]]
+        if not bytes_to_fetch:
+            raise ValueError(f"Instruction decoding is not supported for {asm_bytes[i]:08b} at index {i}")
 
         i += bytes_to_fetch
+        append(i)
 
-    return instructions
+    if i == last:
+        raise ValueError(f"Instruction decoding is not supported for {asm_bytes[i]:08b} at index {i}")
 
-def write_to_file(filename: str, data: str) -> None:
-    with open(file=filename, mode="w") as file:
+    return offsets
+
+def decode_to_asm(asm_bytes: bytes) -> list[str]:
+    """
+    Split the buffer into instructions, then format each one with its decoder
+    """
+    offsets = instruction_offsets(asm_bytes)
+    offsets.pop()
+    decoders = DECODERS
+    return [decoders[asm_bytes[i]](asm_bytes, i) for i in offsets]
+
+def write_to_file(filename: str, data: list[str]) -> None:
+    """
+    Stream the lines through a large write buffer instead of joining them into one
+    string, so the whole listing is not held in memory twice.
+    """
+    with open(file=filename, mode="w", encoding="ascii", buffering=1 << 20) as file:
         file.write("bits 16\n\n")
-        file.write("\n".join(data))
+        if data:
+            file.write(data[0])
+            file.writelines("\n" + line for line in islice(data, 1, None))
 
 
 def main(filename: str) -> None:
     asm_bytes = None
     with open(file=filename, mode='rb') as file:
-        asm_bytes = file.read()
+        asm_bytes = memoryview(file.read())
 
     if not asm_bytes:
         raise ValueError("Nothing to read from input file.")